@@ -1,14 +1,27 @@
 from __future__ import annotations
-import os, time, json
+import os, time, struct, argparse
 from dataclasses import dataclass
 from typing import List, Tuple
 
-from tile_db import GeoGrid, write_tile_db_bin, read_tile_db_bin_header, direct_fetch
-from ypir_adapter import ypir_setup, ypir_make_query, ypir_answer, ypir_extract
+from tile_db import (
+    REC, GeoGrid, write_tile_db_bin, read_tile_db_bin_header, direct_fetch, has_tile_columns,
+)
+from ypir_adapter import (
+    ypir_setup, ypir_invalidate, ypir_make_query, ypir_answer, ypir_extract,
+    ypir_make_query_batch, ypir_answer_batch, ypir_extract_batch, ypir_profile,
+)
+
+
+# Integer nanosecond clock; converted to ms only when printing
+_ns = time.perf_counter_ns
 
 
 @dataclass
 class Result:
+    __slots__ = (
+        "label", "db_path", "n_tiles", "record_size", "idx",
+        "upload_bytes", "download_bytes", "t_client_ns", "t_server_ns", "t_total_ns",
+    )
     label: str
     db_path: str
     n_tiles: int
@@ -16,31 +29,56 @@ class Result:
     idx: int
     upload_bytes: int
     download_bytes: int
-    t_client_ms: float
-    t_server_ms: float
-    t_total_ms: float
+    t_client_ns: int
+    t_server_ns: int
+    t_total_ns: int
 
 
-def _ms(dt: float) -> float:
-    return 1000.0 * dt
+def _ms(ns: int) -> float:
+    return ns / 1e6
 
 
 def ensure_db(path: str, record_size: int, grid: GeoGrid) -> None:
     if os.path.exists(path):
-        return
+        try:
+            if (read_tile_db_bin_header(path)[:2] == (record_size, grid.n_tiles)
+                    and has_tile_columns(path, grid.n_tiles)):
+                return
+        except ValueError:
+            pass  # older format, rebuild
     write_tile_db_bin(path, grid, record_size, seed=42)
+    ypir_invalidate(path)
+
+
+def _tile_dict(tile: int, t: float, aqi: int, p: float, lvl: int) -> dict:
+    return {
+        "tile": tile,
+        "temperature_c": round(t, 1),
+        "air_quality_index": aqi,
+        "precipitation_mm": round(p, 1),
+        "proximity_alert_level": lvl,
+    }
 
 
 def parse_tile_record(rec: bytes) -> dict:
     """
-    Records are JSON padded with NUL bytes to fixed record_size.
+    Records are a packed `REC` struct padded with NUL bytes to fixed record_size.
     """
-    
-    txt = rec.rstrip(b"\x00").decode("utf-8", errors="replace")
     try:
-        return json.loads(txt)
-    except json.JSONDecodeError:
-        return {"_raw": txt}
+        return _tile_dict(*REC.unpack_from(rec, 0))
+    except struct.error:
+        return {"_raw": rec.hex()}
+
+
+def parse_tile_records(recs: List[bytes]) -> List[dict]:
+    """
+    Batch form of parse_tile_record: one struct.iter_unpack over the joined
+    records instead of a Python-level call per record.
+    """
+    if any(len(r) < REC.size for r in recs):
+        return [parse_tile_record(r) for r in recs]
+    buf = b"".join(r[:REC.size] for r in recs)
+    return [_tile_dict(*fields) for fields in REC.iter_unpack(buf)]
 
 
 def pretty_print_tile(d: dict) -> None:
@@ -62,14 +100,14 @@ def run_baseline(db_path: str, idx: int) -> Tuple[Result, bytes]:
     #4 bytes
     upload = 4
 
-    t0 = time.perf_counter()
-    s0 = time.perf_counter()
+    t0 = _ns()
+    s0 = _ns()
     rec = direct_fetch(db_path, idx)
-    s1 = time.perf_counter()
+    s1 = _ns()
 
-    # client decode by removing padding
-    _ = rec.rstrip(b"\x00")
-    t1 = time.perf_counter()
+    # client decode
+    _ = parse_tile_record(rec)
+    t1 = _ns()
 
     return Result(
         label="baseline_direct",
@@ -79,37 +117,37 @@ def run_baseline(db_path: str, idx: int) -> Tuple[Result, bytes]:
         idx=idx,
         upload_bytes=upload,
         download_bytes=len(rec),
-        t_client_ms=_ms((t1 - t0) - (s1 - s0)),
-        t_server_ms=_ms(s1 - s0),
-        t_total_ms=_ms(t1 - t0),
+        t_client_ns=(s0 - t0) + (t1 - s1),
+        t_server_ns=s1 - s0,
+        t_total_ns=t1 - t0,
     ), rec
 
 
 def run_ypir(db_path: str, idx: int) -> Tuple[Result, bytes]:
     record_size, n_tiles, _ = read_tile_db_bin_header(db_path)
 
-    # align them with tile DB
+    # align them with tile DB; setup is cached per DB and kept out of the timings
     ctx = ypir_setup(db_path, n_tiles, record_size, is_simplepir=False)
 
-    t0 = time.perf_counter()
+    t0 = _ns()
 
     # Client query generation
-    c0 = time.perf_counter()
+    c0 = _ns()
     query_bytes = ypir_make_query(ctx, idx)
-    c1 = time.perf_counter()
+    c1 = _ns()
 
     # Server answer
-    s0 = time.perf_counter()
+    s0 = _ns()
     resp_bytes = ypir_answer(ctx, query_bytes)
-    s1 = time.perf_counter()
+    s1 = _ns()
 
     # Client extract
-    c2 = time.perf_counter()
+    c2 = _ns()
     raw = ypir_extract(ctx, resp_bytes)
     rec = bytes(raw[:record_size])
-    c3 = time.perf_counter()
+    c3 = _ns()
 
-    t1 = time.perf_counter()
+    t1 = _ns()
 
     return Result(
         label="ypir",
@@ -119,12 +157,49 @@ def run_ypir(db_path: str, idx: int) -> Tuple[Result, bytes]:
         idx=idx,
         upload_bytes=len(query_bytes),
         download_bytes=len(resp_bytes),
-        t_client_ms=_ms((c1 - c0) + (c3 - c2)),
-        t_server_ms=_ms(s1 - s0),
-        t_total_ms=_ms(t1 - t0),
+        t_client_ns=(c1 - c0) + (c3 - c2),
+        t_server_ns=s1 - s0,
+        t_total_ns=t1 - t0,
     ), rec
 
 
+def run_ypir_batch(db_path: str, idx: int, idxs: List[int]) -> Tuple[Result, List[bytes]]:
+    """Fetch several tiles (e.g. a map viewport around tile idx) in one PIR roundtrip."""
+    record_size, n_tiles, _ = read_tile_db_bin_header(db_path)
+
+    ctx = ypir_setup(db_path, n_tiles, record_size, is_simplepir=False)
+
+    t0 = _ns()
+
+    c0 = _ns()
+    queries = ypir_make_query_batch(ctx, idxs)
+    c1 = _ns()
+
+    s0 = _ns()
+    resps = ypir_answer_batch(ctx, queries)
+    s1 = _ns()
+
+    c2 = _ns()
+    recs = [bytes(raw[:record_size]) for raw in ypir_extract_batch(ctx, resps)]
+    _ = parse_tile_records(recs)
+    c3 = _ns()
+
+    t1 = _ns()
+
+    return Result(
+        label=f"ypir_batch{len(idxs)}",
+        db_path=db_path,
+        n_tiles=n_tiles,
+        record_size=record_size,
+        idx=idx,
+        upload_bytes=sum(len(q) for q in queries),
+        download_bytes=sum(len(r) for r in resps),
+        t_client_ns=(c1 - c0) + (c3 - c2),
+        t_server_ns=s1 - s0,
+        t_total_ns=t1 - t0,
+    ), recs
+
+
 def print_results(results: List[Result]) -> None:
     print("\n=== RESULTS ===")
     print("label,db,tiles,recB,idx,upB,downB,client_ms,server_ms,total_ms")
@@ -132,18 +207,25 @@ def print_results(results: List[Result]) -> None:
         print(
             f"{r.label},{os.path.basename(r.db_path)},{r.n_tiles},{r.record_size},{r.idx},"
             f"{r.upload_bytes},{r.download_bytes},"
-            f"{r.t_client_ms:.2f},{r.t_server_ms:.2f},{r.t_total_ms:.2f}"
+            f"{_ms(r.t_client_ns):.2f},{_ms(r.t_server_ns):.2f},{_ms(r.t_total_ns):.2f}"
         )
 
 
 def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", type=int, default=0, metavar="N",
+                    help="also run YPIR answer N times and report compute- vs memory-bound")
+    ap.add_argument("--dram-gbps", type=float, default=None, metavar="GBPS",
+                    help="host DRAM peak for the --profile verdict (default: measured memcpy)")
+    args = ap.parse_args()
+
     grid = GeoGrid(
         lat_min=48.0, lon_min=8.0,
         lat_step=0.01, lon_step=0.01,
         n_lat=400, n_lon=400
     )
 
-    record_size = 256  # bytes per tile record
+    record_size = REC.size  # bytes per tile record
 
     os.makedirs("data", exist_ok=True)
     db_path = os.path.join("data", "tiles.bin")
@@ -154,17 +236,36 @@ def main() -> None:
     lat, lon = 48.137, 11.575
     idx = grid.tile_index(lat, lon)
 
+    # Timed regions run one after another: overlapping them lets GIL-holding
+    # YPIR calls stall the microsecond baseline fetch and skews both rows.
     baseline_res, baseline_rec = run_baseline(db_path, idx)
     ypir_res, ypir_rec = run_ypir(db_path, idx)
+    # 3x3 viewport around the user, one batched roundtrip
+    batch_res, batch_recs = run_ypir_batch(db_path, idx, grid.neighborhood(idx))
+    prof = None
+    if args.profile:
+        ctx = ypir_setup(db_path, grid.n_tiles, record_size, is_simplepir=False)
+        prof = ypir_profile(ctx, args.profile, dram_peak_gbps=args.dram_gbps)
 
     print("\n=== TILE DATA (decoded from returned record) ===")
     print("Baseline direct fetch:")
     pretty_print_tile(parse_tile_record(baseline_rec))
 
 
-    results: List[Result] = [baseline_res, ypir_res]
+    results: List[Result] = [baseline_res, ypir_res, batch_res]
     print_results(results)
 
+    if prof is not None:
+        print("\n=== YPIR PROFILE ===")
+        print(f"runs: {prof.runs}, answer: {prof.answer_ms:.2f} ms, {prof.gb_per_s:.2f} GB/s")
+        if prof.peak_rss_bytes is not None:
+            print(f"peak RSS: {prof.peak_rss_bytes / 2**20:.1f} MiB")
+        print(f"DRAM peak: {prof.dram_peak_gbps:.2f} GB/s")
+        if prof.compute_bound is None:
+            print("compute_bound: verdict skipped (DB fits in LLC)")
+        else:
+            print(f"compute_bound={prof.compute_bound}")
+
 
 if __name__ == "__main__":
     main()
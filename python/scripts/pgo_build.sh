@@ -0,0 +1,26 @@
+#!/usr/bin/env bash
+# Profile-guided + fat-LTO build of ypir_rs.
+#   1. instrumented build, 2. profile with the demo, 3. rebuild using the profile.
+# Needs maturin and llvm-profdata (rustup component add llvm-tools-preview).
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+
+PGO_DIR=${PGO_DIR:-/tmp/pgo}
+RUNS=${RUNS:-200}
+# RUSTFLAGS replaces .cargo/config.toml rustflags, so keep target-cpu=native here
+BASE_FLAGS="-Ctarget-cpu=native"
+
+rm -rf "$PGO_DIR"
+mkdir -p "$PGO_DIR"
+
+RUSTFLAGS="$BASE_FLAGS -Cprofile-generate=$PGO_DIR" maturin develop --release
+python demo_geopir.py --profile "$RUNS"
+
+LLVM_PROFDATA=${LLVM_PROFDATA:-$(find "$(rustc --print sysroot)" -name llvm-profdata -type f | head -n 1)}
+"$LLVM_PROFDATA" merge -o "$PGO_DIR/merged.profdata" "$PGO_DIR"
+
+CARGO_PROFILE_RELEASE_LTO=fat \
+CARGO_PROFILE_RELEASE_CODEGEN_UNITS=1 \
+RUSTFLAGS="$BASE_FLAGS -Cprofile-use=$PGO_DIR/merged.profdata" \
+    maturin develop --release
@@ -1,14 +1,20 @@
-use pyo3::exceptions::PyValueError;
+use pyo3::buffer::PyBuffer;
+use pyo3::exceptions::{PyRuntimeError, PyValueError};
 use pyo3::prelude::*;
+use pyo3::types::PyByteArray;
+use rayon::prelude::*;
 
 use spiral_rs::aligned_memory::AlignedMemory64;
 use spiral_rs::client::Client as SpiralClient;
 use spiral_rs::params::Params as SpiralParams;
 
-use ypir::client::{pack_query, YClient};
+use ypir::client::{pack_query, pack_query_word, YClient};
 use ypir::params::{params_for_scenario, params_for_scenario_simplepir};
 use ypir::server::YServer;
 
+// Most queries answered together in one pass over the DB (const K of multiply_batched_with_db_packed_cols).
+const MAX_BATCH: usize = 16;
+
 // ---------- helpers: bytes <-> u64 words (little-endian) ----------
 
 unsafe fn shrink_client_lifetime<'a>(
@@ -46,6 +52,68 @@ fn aligned64_to_bytes_le(mem: &AlignedMemory64) -> Vec<u8> {
     u64_to_bytes_le(mem.as_slice())
 }
 
+/// Write words (little-endian) into the front of a caller-owned bytearray; returns bytes written.
+fn u64_into_bytearray_le<I>(words: I, out: &Bound<'_, PyByteArray>) -> PyResult<usize>
+where
+    I: ExactSizeIterator<Item = u64>,
+{
+    let n = words.len() * 8;
+    if out.len() < n {
+        return Err(PyValueError::new_err(format!(
+            "output buffer too small: got {} bytes, need {}",
+            out.len(),
+            n
+        )));
+    }
+    // SAFETY: the GIL is held and no Python code runs while `dst` is alive,
+    // so the bytearray cannot be resized underneath us.
+    let dst = unsafe { out.as_bytes_mut() };
+    for (chunk, w) in dst[..n].chunks_exact_mut(8).zip(words) {
+        chunk.copy_from_slice(&w.to_le_bytes());
+    }
+    Ok(n)
+}
+
+/// Decode a little-endian u64 buffer into `dst` (reusing its allocation), without an intermediate Vec<u8>.
+fn buffer_to_u64_le_into(py: Python<'_>, buf: &PyBuffer<u8>, dst: &mut Vec<u64>) -> PyResult<()> {
+    let cells = buf
+        .as_slice(py)
+        .ok_or_else(|| PyValueError::new_err("buffer must be a C-contiguous byte buffer"))?;
+    if cells.len() % 8 != 0 {
+        return Err(PyValueError::new_err("byte length must be multiple of 8"));
+    }
+    dst.clear();
+    dst.extend(cells.chunks_exact(8).map(|c| {
+        let mut b = [0u8; 8];
+        for (d, s) in b.iter_mut().zip(c) {
+            *d = s.get();
+        }
+        u64::from_le_bytes(b)
+    }));
+    Ok(())
+}
+
+// Moves an answer buffer out of py.detach. AlignedMemory64 owns its allocation
+// exclusively, so transferring it to the thread that called detach is sound.
+struct SendAligned(AlignedMemory64);
+
+unsafe impl Send for SendAligned {}
+
+// Lets the read-only server be used from rayon workers / with the GIL released.
+// Only wraps YServer<u8>: answer_query takes &self and never mutates, so
+// sharing the reference is sound. Do not generalize to other types.
+struct SharedServer<'a>(&'a YServer<'static, u8>);
+
+unsafe impl Send for SharedServer<'_> {}
+unsafe impl Sync for SharedServer<'_> {}
+
+impl<'a> SharedServer<'a> {
+    // Accessor (rather than `.0`) so closures capture the wrapper, not the field.
+    fn get(&self) -> &'a YServer<'static, u8> {
+        self.0
+    }
+}
+
 // ---------- Python-exposed wrapper types ----------
 // IMPORTANT: mark unsendable so PyO3 does NOT require Send/Sync.
 
@@ -75,8 +143,9 @@ struct PyYpirClient {
 #[pyclass(unsendable)]
 struct PyYpirServer {
     params: &'static SpiralParams,
-    db_bytes: Vec<u8>,
     inner: YServer<'static, u8>,
+    // Scratch for answer_into's decoded query, reused across calls
+    query_words: Vec<u64>,
 }
 
 // ---------- constructors / API ----------
@@ -86,8 +155,7 @@ fn params_db_dim_1(params: &PyYpirParams) -> usize {
     params.params.db_dim_1
 }
 
-#[pyfunction]
-fn required_db_bytes(params: &PyYpirParams) -> usize {
+fn db_shape(params: &PyYpirParams) -> (usize, usize) {
     let p = params.params;
     let db_rows = 1 << (p.db_dim_1 + p.poly_len_log2);
     let db_cols = if params.is_simplepir {
@@ -95,9 +163,27 @@ fn required_db_bytes(params: &PyYpirParams) -> usize {
     } else {
         1 << (p.db_dim_2 + p.poly_len_log2)
     };
+    (db_rows, db_cols)
+}
+
+#[pyfunction]
+fn required_db_bytes(params: &PyYpirParams) -> usize {
+    let (db_rows, db_cols) = db_shape(params);
     db_rows * db_cols
 }
 
+/// Size in bytes of a packed query (one u64 per DB row).
+#[pyfunction]
+fn query_len(params: &PyYpirParams) -> usize {
+    db_shape(params).0 * 8
+}
+
+/// Size in bytes of a single-query response (one u64 per DB column).
+#[pyfunction]
+fn response_len(params: &PyYpirParams) -> usize {
+    db_shape(params).1 * 8
+}
+
 
 /// Build spiral params from scenario helpers in ypir::params
 #[pyfunction]
@@ -137,42 +223,42 @@ fn client_new(params: &PyYpirParams) -> PyResult<PyYpirClient> {
 }
 
 /// Create server using u8 DB elements (required by ToM512 bounds in server.rs).
+/// `db_bytes` may be any contiguous byte buffer (bytes, bytearray, memoryview);
+/// it is streamed straight into the server without an intermediate copy.
 #[pyfunction]
 fn server_new(
+    py: Python<'_>,
     params: &PyYpirParams,
-    db_bytes: Vec<u8>,
+    db_bytes: PyBuffer<u8>,
     inp_transposed: bool,
     pad_rows: bool,
 ) -> PyResult<PyYpirServer> {
     let p = params.params;
 
-    let db_rows = 1 << (p.db_dim_1 + p.poly_len_log2);
-    let db_cols = if params.is_simplepir {
-        p.instances * p.poly_len
-    } else {
-        1 << (p.db_dim_2 + p.poly_len_log2)
-    };
+    let (db_rows, db_cols) = db_shape(params);
     let needed = db_rows * db_cols;
 
-    if db_bytes.len() < needed {
+    if db_bytes.item_count() < needed {
         return Err(PyValueError::new_err(format!(
             "db_bytes too small: got {} bytes, need at least {} (db_rows={} db_cols={})",
-            db_bytes.len(),
+            db_bytes.item_count(),
             needed,
             db_rows,
             db_cols
         )));
     }
 
-    let db_for_server = db_bytes[..needed].to_vec();
-    let iter = db_for_server.iter().copied();
+    let db = db_bytes
+        .as_slice(py)
+        .ok_or_else(|| PyValueError::new_err("db_bytes must be a C-contiguous byte buffer"))?;
+    let iter = db[..needed].iter().map(|c| c.get());
 
     let s = YServer::<u8>::new(p, iter, params.is_simplepir, inp_transposed, pad_rows);
 
     Ok(PyYpirServer {
         params: p,
-        db_bytes: db_for_server,
         inner: s,
+        query_words: Vec::new(),
     })
 }
 
@@ -201,17 +287,125 @@ fn query(
     }
 }
 
+/// Like query(pack=true), but writes into a reusable bytearray; returns bytes written.
+#[pyfunction]
+fn query_into(
+    client: &mut PyYpirClient,
+    public_seed_idx: u8,
+    dim_log2: usize,
+    packing: bool,
+    index_row: usize,
+    out: &Bound<'_, PyByteArray>,
+) -> PyResult<usize> {
+    let q_words: Vec<u64> = unsafe {
+        let inner = shrink_client_lifetime(&mut client.inner);
+        let params = shrink_params_lifetime(client.params);
+        let y = YClient::new(inner, params);
+        y.generate_query(public_seed_idx, dim_log2, packing, index_row)
+    };
+    // Pack straight into `out` (pack_query's per-word mapping, without its allocation)
+    let params = client.params;
+    let packed = q_words.iter().map(|&x| pack_query_word(params, x));
+    u64_into_bytearray_le(packed, out)
+}
+
 
 #[pyfunction]
-fn answer(server: &PyYpirServer, packed_query_bytes: Vec<u8>) -> PyResult<Vec<u8>> {
+fn answer(py: Python<'_>, server: &PyYpirServer, packed_query_bytes: Vec<u8>) -> PyResult<Vec<u8>> {
     let packed_words = bytes_to_u64_le(&packed_query_bytes)?;
-    let resp: AlignedMemory64 = server.inner.answer_query(&packed_words);
-    Ok(aligned64_to_bytes_le(&resp))
+    let srv = SharedServer(&server.inner);
+    Ok(py.detach(|| aligned64_to_bytes_le(&srv.get().answer_query(&packed_words))))
+}
+
+// Answer up to MAX_BATCH queries with one pass over the DB. The column range
+// is split across rayon workers; each worker runs the K-accumulator kernel over
+// its own columns into its own output, so every DB element is still read once.
+fn answer_chunk(server: &YServer<'static, u8>, chunk: &[Vec<u64>]) -> Vec<Vec<u8>> {
+    let k = chunk.len();
+    let concat = chunk.concat();
+    let db_cols = server.db_cols();
+    let span = db_cols.div_ceil(rayon::current_num_threads()).max(1);
+    macro_rules! dispatch {
+        ($cols:expr, $out:expr; $($k:literal)*) => {
+            match k {
+                $($k => server.multiply_batched_with_db_packed_cols::<$k>(&concat, $cols, $out),)*
+                _ => unreachable!("chunk larger than MAX_BATCH"),
+            }
+        };
+    }
+    let parts: Vec<Vec<u64>> = (0..db_cols.div_ceil(span))
+        .into_par_iter()
+        .map(|i| {
+            let cols = i * span..((i + 1) * span).min(db_cols);
+            let mut out = vec![0u64; k * cols.len()];
+            dispatch!(cols, &mut out; 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16);
+            out
+        })
+        .collect();
+    // Reassemble each query's response from the per-range outputs, in column order.
+    (0..k)
+        .map(|q| {
+            let mut bytes = Vec::with_capacity(db_cols * 8);
+            for part in &parts {
+                let w = part.len() / k;
+                for x in &part[q * w..(q + 1) * w] {
+                    bytes.extend_from_slice(&x.to_le_bytes());
+                }
+            }
+            bytes
+        })
+        .collect()
+}
+
+/// Like answer(), but writes into a reusable bytearray; returns bytes written.
+#[pyfunction]
+fn answer_into(
+    py: Python<'_>,
+    server: &mut PyYpirServer,
+    packed_query_bytes: PyBuffer<u8>,
+    out: &Bound<'_, PyByteArray>,
+) -> PyResult<usize> {
+    buffer_to_u64_le_into(py, &packed_query_bytes, &mut server.query_words)?;
+    let words = &server.query_words;
+    let srv = SharedServer(&server.inner);
+    let resp = py.detach(|| SendAligned(srv.get().answer_query(words)));
+    u64_into_bytearray_le(resp.0.as_slice().iter().copied(), out)
+}
+
+/// Answer several packed queries against the same server. Each group of up to
+/// MAX_BATCH queries is answered in a single DB pass, parallelized by splitting
+/// the DB columns across rayon workers; groups run one after another.
+#[pyfunction]
+fn answer_batch(
+    py: Python<'_>,
+    server: &PyYpirServer,
+    packed_queries: Vec<Vec<u8>>,
+) -> PyResult<Vec<Vec<u8>>> {
+    let queries = packed_queries
+        .iter()
+        .map(|q| bytes_to_u64_le(q))
+        .collect::<PyResult<Vec<_>>>()?;
+    let srv = SharedServer(&server.inner);
+    Ok(py.detach(|| {
+        queries
+            .chunks(MAX_BATCH)
+            .flat_map(|chunk| answer_chunk(srv.get(), chunk))
+            .collect()
+    }))
+}
+
+/// Size the global rayon pool. Only effective before the pool is first used.
+#[pyfunction]
+fn set_thread_pool(num_threads: usize) -> PyResult<()> {
+    rayon::ThreadPoolBuilder::new()
+        .num_threads(num_threads)
+        .build_global()
+        .map_err(|e| PyRuntimeError::new_err(e.to_string()))
 }
 
 #[pyfunction]
-fn extract(client: &mut PyYpirClient, response_bytes: Vec<u8>) -> PyResult<Vec<u8>> {
-    let resp_words = bytes_to_u64_le(&response_bytes)?;
+fn extract(py: Python<'_>, client: &mut PyYpirClient, response_bytes: PyBuffer<u8>) -> PyResult<Vec<u8>> {
+    let resp_words = bytes_to_u64_le(&response_bytes.to_vec(py)?)?;
 
     let out: Vec<u64> = unsafe {
         let inner = shrink_client_lifetime(&mut client.inner);
@@ -229,11 +423,17 @@ fn ypir_rs(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(client_new, m)?)?;
     m.add_function(wrap_pyfunction!(server_new, m)?)?;
     m.add_function(wrap_pyfunction!(query, m)?)?;
+    m.add_function(wrap_pyfunction!(query_into, m)?)?;
     m.add_function(wrap_pyfunction!(answer, m)?)?;
+    m.add_function(wrap_pyfunction!(answer_into, m)?)?;
+    m.add_function(wrap_pyfunction!(answer_batch, m)?)?;
     m.add_function(wrap_pyfunction!(extract, m)?)?;
 
     m.add_function(wrap_pyfunction!(params_db_dim_1, m)?)?;
     m.add_function(wrap_pyfunction!(required_db_bytes, m)?)?;
+    m.add_function(wrap_pyfunction!(query_len, m)?)?;
+    m.add_function(wrap_pyfunction!(response_len, m)?)?;
+    m.add_function(wrap_pyfunction!(set_thread_pool, m)?)?;
 
     m.add_class::<PyYpirParams>()?;
     m.add_class::<PyYpirClient>()?;
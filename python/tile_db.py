@@ -1,7 +1,62 @@
 from __future__ import annotations
-import os, json, math, struct, random
-from dataclasses import dataclass
-from typing import Tuple
+import os, mmap, struct, atexit, contextlib, functools
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; kernels below then run as plain Python
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+    prange = range
+
+# Fixed record layout: tile_id u32, temperature f32, aqi u16, precipitation f32, alert u8
+REC = struct.Struct("<IfHfB")
+MAGIC = b"TILEDB2"
+
+# Columnar copy of the same fields, one little-endian array file per column
+TILE_COLUMNS = {
+    "id": np.dtype("<u4"),
+    "temp": np.dtype("<f4"),
+    "aqi": np.dtype("<u2"),
+    "precip": np.dtype("<f4"),
+    "alert": np.dtype("u1"),
+}
+
+
+@njit(
+    "int64(float64, float64, float64, float64, float64, float64, int64, int64)",
+    cache=True,
+    boundscheck=False,
+)
+def _tile_index_kernel(lat, lon, lat_min, lon_min, inv_lat_step, inv_lon_step, n_lat, n_lon):
+    x = (lat - lat_min) * inv_lat_step
+    y = (lon - lon_min) * inv_lon_step
+    if x != x or y != y:
+        raise ValueError("lat/lon must not be NaN")
+    # Clamp in float space (min/max lower to minsd/maxsd) so int() never sees a
+    # value outside int64; truncation then equals floor since x, y >= 0.
+    x = min(max(x, 0.0), n_lat - 1.0)
+    y = min(max(y, 0.0), n_lon - 1.0)
+    return int(x) * n_lon + int(y)
+
+
+@njit(
+    "int64[:](float64[:], float64[:], float64, float64, float64, float64, int64, int64)",
+    cache=True,
+    parallel=True,
+    boundscheck=False,
+)
+def _tile_index_batch_kernel(lats, lons, lat_min, lon_min, inv_lat_step, inv_lon_step, n_lat, n_lon):
+    out = np.empty(lats.shape[0], dtype=np.int64)
+    for k in prange(lats.shape[0]):
+        out[k] = _tile_index_kernel(
+            lats[k], lons[k], lat_min, lon_min, inv_lat_step, inv_lon_step, n_lat, n_lon
+        )
+    return out
+
 
 @dataclass(frozen=True)
 class GeoGrid:
@@ -11,26 +66,47 @@ class GeoGrid:
     lon_step: float
     n_lat: int
     n_lon: int
+    inv_lat_step: float = field(init=False, repr=False, compare=False)
+    inv_lon_step: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Frozen dataclass: precompute reciprocals so tile_index multiplies instead of divides
+        object.__setattr__(self, "inv_lat_step", 1.0 / self.lat_step)
+        object.__setattr__(self, "inv_lon_step", 1.0 / self.lon_step)
 
     def tile_index(self, lat: float, lon: float) -> int:
-        """Map (lat,lon) -> [0, n_lat*n_lon). Clamps to grid."""
-        i = int(math.floor((lat - self.lat_min) / self.lat_step))
-        j = int(math.floor((lon - self.lon_min) / self.lon_step))
-        i = max(0, min(self.n_lat - 1, i))
-        j = max(0, min(self.n_lon - 1, j))
-        return i * self.n_lon + j
+        """Map (lat,lon) -> [0, n_lat*n_lon). Clamps to grid; NaN raises ValueError."""
+        return _tile_index_kernel(
+            lat, lon, self.lat_min, self.lon_min, self.inv_lat_step, self.inv_lon_step, self.n_lat, self.n_lon
+        )
+
+    def tile_index_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Vectorized tile_index over float64 arrays; returns int64 indices."""
+        lats = np.ascontiguousarray(lats, dtype=np.float64)
+        lons = np.ascontiguousarray(lons, dtype=np.float64)
+        if lats.shape != lons.shape or lats.ndim != 1:
+            raise ValueError("lats and lons must be 1-D arrays of equal length")
+        # Checked up front: exceptions raised inside a parallel prange are not propagated
+        if np.isnan(lats).any() or np.isnan(lons).any():
+            raise ValueError("lat/lon must not be NaN")
+        return _tile_index_batch_kernel(
+            lats, lons, self.lat_min, self.lon_min, self.inv_lat_step, self.inv_lon_step, self.n_lat, self.n_lon
+        )
+
+    def neighborhood(self, idx: int, radius: int = 1) -> List[int]:
+        """Indices of the (2*radius+1)^2 tiles around idx, clipped to the grid."""
+        i, j = divmod(idx, self.n_lon)
+        return [
+            ii * self.n_lon + jj
+            for ii in range(max(0, i - radius), min(self.n_lat, i + radius + 1))
+            for jj in range(max(0, j - radius), min(self.n_lon, j + radius + 1))
+        ]
 
     @property
     def n_tiles(self) -> int:
         return self.n_lat * self.n_lon
 
 
-def _pad_record(b: bytes, record_size: int) -> bytes:
-    if len(b) > record_size:
-        return b[:record_size]
-    return b + b"\x00" * (record_size - len(b))
-
-
 def write_tile_db_bin(
     path: str,
     grid: GeoGrid,
@@ -39,44 +115,190 @@ def write_tile_db_bin(
 ) -> None:
     """
     Writes a binary file of N fixed-size records.
-    Record i contains JSON metadata + padding to `record_size`.
+    Record i is a packed `REC` struct + zero padding to `record_size`.
+    Also writes the columnar files read by `TileTable`.
     """
+    if record_size < REC.size:
+        raise ValueError(f"record_size must be >= {REC.size}")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    rng = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    n = grid.n_tiles
 
+    # Fields to show in demo, generated in bulk (one call per field)
+    cols = {
+        "id": np.arange(n),
+        "temp": np.round(rng.uniform(-10.0, 40.0, n), 1),
+        "aqi": rng.integers(0, 301, n),                     # 0..300
+        "precip": np.round(rng.uniform(0.0, 25.0, n), 1),
+        "alert": rng.integers(1, 5, n),                     # 1..4
+    }
+    temps, aqi, precip, alert = (cols[k].tolist() for k in ("temp", "aqi", "precip", "alert"))
+
+    # Records are laid out back to back; padding is already zero.
+    buf = bytearray(n * record_size)
+    pack_into = REC.pack_into
+    for idx in range(n):
+        pack_into(buf, idx * record_size, idx, temps[idx], aqi[idx], precip[idx], alert[idx])
+
+    # Unmap before truncating; touching a mapping past EOF raises SIGBUS
+    _invalidate(path)
     with open(path, "wb") as f:
         # header: magic + record_size + n_tiles
-        f.write(b"TILEDB1")
-        f.write(struct.pack("<II", record_size, grid.n_tiles))
-
-        for idx in range(grid.n_tiles):
-            #Fields to show in dmeo
-            payload = {
-                "tile": idx,
-                "temperature_c": round(rng.uniform(-10.0, 40.0), 1),
-                "air_quality_index": int(rng.uniform(0, 301)),      # 0..300
-                "precipitation_mm": round(rng.uniform(0.0, 25.0), 1),
-                "proximity_alert_level": int(rng.uniform(1, 5)),    # 1..4
-            }
-            raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
-            f.write(_pad_record(raw, record_size))
+        f.write(MAGIC)
+        f.write(struct.pack("<II", record_size, n))
+        f.write(buf)
+
+    for name, dtype in TILE_COLUMNS.items():
+        cols[name].astype(dtype).tofile(_column_path(path, name))
+
+
+def _column_path(path: str, name: str) -> str:
+    return f"{os.path.splitext(path)[0]}.{name}.bin"
+
+
+def has_tile_columns(path: str, n_tiles: int) -> bool:
+    """True if every TileTable column file next to `path` exists with n_tiles entries."""
+    for name, dtype in TILE_COLUMNS.items():
+        col = _column_path(path, name)
+        if not os.path.exists(col) or os.path.getsize(col) != n_tiles * dtype.itemsize:
+            return False
+    return True
+
+
+@dataclass(frozen=True)
+class TileRecord:
+    tile: int
+    temperature_c: float
+    air_quality_index: int
+    precipitation_mm: float
+    proximity_alert_level: int
+
+
+@dataclass(frozen=True)
+class TileTable:
+    """
+    Structure-of-arrays view of a tile DB (memory-mapped column files).
+    Lookups read one element per column, with no record decode.
+    """
+    id: np.ndarray
+    temp: np.ndarray
+    aqi: np.ndarray
+    precip: np.ndarray
+    alert: np.ndarray
+
+    @classmethod
+    def from_db(cls, path: str) -> TileTable:
+        """Open the columns written next to the DB at `path` by write_tile_db_bin."""
+        return cls(**{
+            name: np.memmap(_column_path(path, name), dtype=dtype, mode="r")
+            for name, dtype in TILE_COLUMNS.items()
+        })
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def get(self, idx: int) -> TileRecord:
+        if not (0 <= idx < len(self)):
+            raise IndexError("idx out of range")
+        return TileRecord(
+            tile=int(self.id[idx]),
+            temperature_c=round(float(self.temp[idx]), 1),
+            air_quality_index=int(self.aqi[idx]),
+            precipitation_mm=round(float(self.precip[idx]), 1),
+            proximity_alert_level=int(self.alert[idx]),
+        )
+
+    def query_range(self, aqi_ge: int) -> np.ndarray:
+        """Tile indices with AQI >= aqi_ge."""
+        return (self.aqi >= aqi_ge).nonzero()[0]
 
 
 def read_tile_db_bin_header(path: str) -> Tuple[int, int, int]:
     with open(path, "rb") as f:
-        magic = f.read(7)
-        if magic != b"TILEDB1":
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
             raise ValueError("Bad magic header")
         record_size, n_tiles = struct.unpack("<II", f.read(8))
-        header_size = 7 + 8
+        header_size = len(MAGIC) + 8
     return record_size, n_tiles, header_size
 
 
+# Long-lived read-only mappings, one per DB path (see direct_fetch)
+_MMAP_CACHE: Dict[str, mmap.mmap] = {}
+
+
+@functools.lru_cache(maxsize=32)
+def _header_cached(path: str) -> Tuple[int, int, int]:
+    return read_tile_db_bin_header(path)
+
+
+def _get_mmap(path: str) -> mmap.mmap:
+    mm = _MMAP_CACHE.get(path)
+    if mm is None:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # direct_fetch touches single records: kernel readahead only pollutes the cache
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_RANDOM)
+            mm = _MMAP_CACHE[path] = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)  # the mapping keeps its own reference
+        _madvise(mm, "MADV_RANDOM")
+    return mm
+
+
+def _close_mmap(mm: mmap.mmap) -> None:
+    try:
+        mm.close()
+    except BufferError:
+        pass  # a caller still holds a view; unmapped once it is released
+
+
+def _invalidate(path: str) -> None:
+    """Drop cached header/mapping for `path` (called after the file is rewritten)."""
+    _header_cached.cache_clear()
+    mm = _MMAP_CACHE.pop(path, None)
+    if mm is not None:
+        _close_mmap(mm)
+
+
+@atexit.register
+def _close_all() -> None:
+    for mm in _MMAP_CACHE.values():
+        _close_mmap(mm)
+    _MMAP_CACHE.clear()
+
+
+def records_view(path: str) -> memoryview:
+    """Zero-copy view of the records region (everything after the header)."""
+    _, _, header_size = _header_cached(path)
+    return memoryview(_get_mmap(path))[header_size:]
+
+
+def _madvise(mm: mmap.mmap, option: str) -> None:
+    if hasattr(mmap, option):
+        mm.madvise(getattr(mmap, option))
+
+
+@contextlib.contextmanager
+def sequential_scan(path: str):
+    """
+    Advise the cached mapping for a full front-to-back read (readahead on,
+    prefetch everything), restoring MADV_RANDOM for direct_fetch afterwards.
+    """
+    mm = _get_mmap(path)
+    _madvise(mm, "MADV_SEQUENTIAL")
+    _madvise(mm, "MADV_WILLNEED")
+    try:
+        yield
+    finally:
+        _madvise(mm, "MADV_RANDOM")
+
+
 def direct_fetch(path: str, idx: int) -> bytes:
-    """Baseline (non-PIR): server returns record idx."""
-    record_size, n_tiles, header_size = read_tile_db_bin_header(path)
+    """Baseline (non-PIR): server returns record idx, sliced from the cached mapping."""
+    record_size, n_tiles, header_size = _header_cached(path)
     if not (0 <= idx < n_tiles):
         raise IndexError("idx out of range")
-    with open(path, "rb") as f:
-        f.seek(header_size + idx * record_size)
-        return f.read(record_size)
+    off = header_size + idx * record_size
+    return _get_mmap(path)[off:off + record_size]
@@ -1,10 +1,12 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Tuple, Optional
+import os, time, threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple, Optional, Union
 
+import numpy as np
 import ypir_rs
 
-from tile_db import read_tile_db_bin_header
+from tile_db import records_view, sequential_scan
 
 
 @dataclass
@@ -16,51 +18,98 @@ class YpirContext:
     required_db_bytes: int
     n_items: int
     item_size_bytes: int
+    # Reused by ypir_make_query / ypir_answer instead of allocating per call
+    _query_buf: bytearray = field(default_factory=bytearray, repr=False)
+    _resp_buf: bytearray = field(default_factory=bytearray, repr=False)
 
 
-def _read_records_region(db_path: str) -> bytes:
-    """Reads only the records region (skips TILEDB header)."""
-    record_size, n_tiles, header_size = read_tile_db_bin_header(db_path)
-    with open(db_path, "rb") as f:
-        f.seek(header_size)
-        return f.read()
+def _read_records_region(db_path: str) -> memoryview:
+    """Zero-copy view of the records region (skips TILEDB header)."""
+    return records_view(db_path)
 
 
-def _build_ypir_db_bytes(db_path: str, required: int) -> bytes:
+def _build_ypir_db_bytes(db_path: str, required: int) -> Union[memoryview, bytearray]:
     """
     YPIR expects a big flattened u8 matrix of a specific length.
     Your TILEDB file is N fixed-size records; here we map it into the required
     length by repeating/truncating the records region.
+    Returns a buffer (no extra bytes copy); ypir_rs.server_new accepts any
+    contiguous byte buffer.
     """
-    records = _read_records_region(db_path)
-    if len(records) == 0:
-        raise ValueError("DB records region is empty")
+    with _read_records_region(db_path) as records:
+        if len(records) == 0:
+            raise ValueError("DB records region is empty")
 
-    if len(records) >= required:
-        return records[:required]
+        if len(records) >= required:
+            return records[:required]
 
-    # Repeat records until we have enough bytes
-    reps = (required + len(records) - 1) // len(records)
-    big = (records * reps)[:required]
-    return big
+        # Repeat records until we have enough bytes. O(required) memory:
+        # never materialize `records * reps` before truncating.
+        out = bytearray(required)
+        mv = memoryview(out)
+        pos = 0
+        while pos < required:
+            n = min(len(records), required - pos)
+            mv[pos:pos + n] = records[:n]
+            pos += n
+        return out
+
+
+# Setup is independent of the queried index, so contexts are reused across queries.
+# ypir_rs objects are unsendable (usable only on the creating thread), so each
+# thread keeps its own cache; its contexts are freed when the thread exits.
+_CTX_LOCAL = threading.local()
+
+
+def _ctx_cache() -> Dict[Tuple[str, int, int, bool], YpirContext]:
+    cache = getattr(_CTX_LOCAL, "cache", None)
+    if cache is None:
+        cache = _CTX_LOCAL.cache = {}
+    return cache
 
 
 def ypir_setup(db_path: str, n_items: int, item_size_bytes: int, *, is_simplepir: bool = False) -> YpirContext:
     """
-    Builds params, client, and server.
+    Returns this thread's cached context for this DB/shape, building it on first use.
     NOTE: is_simplepir=False corresponds to your "YPIR" path.
     """
+    cache = _ctx_cache()
+    key = (db_path, n_items, item_size_bytes, is_simplepir)
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = cache[key] = _build_ctx(db_path, n_items, item_size_bytes, is_simplepir)
+    return ctx
+
+
+def ypir_invalidate(db_path: str) -> None:
+    """
+    Drop this thread's cached contexts for `db_path`; call after the DB file
+    changes. Other threads must call it themselves.
+    """
+    cache = _ctx_cache()
+    for key in [k for k in cache if k[0] == db_path]:
+        del cache[key]
+
+
+def _build_ctx(db_path: str, n_items: int, item_size_bytes: int, is_simplepir: bool) -> YpirContext:
+    """
+    Builds params, client, and server.
+    """
     params = ypir_rs.params_for(n_items, item_size_bytes, is_simplepir)
     dim_log2 = int(ypir_rs.params_db_dim_1(params))
     required = int(ypir_rs.required_db_bytes(params))
 
-    # Build DB bytes in the format the  server expects
-    db_bytes = _build_ypir_db_bytes(db_path, required)
-
     client = ypir_rs.client_new(params)
 
-    #defaults
-    server = ypir_rs.server_new(params, db_bytes, False, True)
+    # The records region is read front to back, possibly lazily by server_new
+    # (when db_bytes is a view of the mapping), so both run under the scan advice.
+    with sequential_scan(db_path):
+        # Build DB bytes in the format the  server expects
+        db_bytes = _build_ypir_db_bytes(db_path, required)
+
+        #defaults
+        server = ypir_rs.server_new(params, db_bytes, False, True)
+        del db_bytes
 
     return YpirContext(
         params=params,
@@ -70,32 +119,182 @@ def ypir_setup(db_path: str, n_items: int, item_size_bytes: int, *, is_simplepir
         required_db_bytes=required,
         n_items=n_items,
         item_size_bytes=item_size_bytes,
+        _query_buf=bytearray(ypir_rs.query_len(params)),
+        _resp_buf=bytearray(ypir_rs.response_len(params)),
     )
 
 
-def ypir_make_query(ctx: YpirContext, idx: int) -> bytes:
-    """
-    Generates a packed query bytes blob (ready for ypir_rs.answer).
-    """
+def _query_args(ctx: YpirContext, idx: int) -> Tuple[int, int, bool, int]:
     # Mod 2^dim_log2
     row = idx % (1 << ctx.dim_log2)
 
     # defaults for packing step
     public_seed_idx = 0
     packing = True
-    pack = True 
 
-    return ypir_rs.query(ctx.client, public_seed_idx, ctx.dim_log2, packing, row, pack)
+    return public_seed_idx, ctx.dim_log2, packing, row
 
 
-def ypir_answer(ctx: YpirContext, query_bytes: bytes) -> bytes:
-    return ypir_rs.answer(ctx.server, query_bytes)
+def ypir_make_query(ctx: YpirContext, idx: int) -> memoryview:
+    """
+    Generates a packed query blob (ready for ypir_rs.answer) in the context's
+    reusable query buffer. The view is overwritten by the next call;
+    copy it (bytes(...)) to keep it. Use ypir_make_query_batch for owned queries.
+    """
+    n = ypir_rs.query_into(ctx.client, *_query_args(ctx, idx), ctx._query_buf)
+    return memoryview(ctx._query_buf)[:n]
 
 
-def ypir_extract(ctx: YpirContext, response_bytes: bytes) -> bytes:
+def ypir_answer(ctx: YpirContext, query_bytes: Union[bytes, memoryview]) -> memoryview:
+    """
+    Answer into the context's reusable response buffer. The returned view is
+    overwritten by the next ypir_answer on this context; copy it (bytes(...))
+    to keep it.
+    """
+    n = ypir_rs.answer_into(ctx.server, query_bytes, ctx._resp_buf)
+    return memoryview(ctx._resp_buf)[:n]
+
+
+def ypir_make_query_batch(ctx: YpirContext, idxs: Sequence[int]) -> List[bytes]:
+    """One packed query per index, all from the same client (owned bytes, not the shared buffer)."""
+    return [ypir_rs.query(ctx.client, *_query_args(ctx, idx), True) for idx in idxs]
+
+
+def ypir_answer_batch(ctx: YpirContext, queries: Sequence[bytes]) -> List[bytes]:
+    """
+    Answers several queries in one call, with the GIL released. Each group of
+    up to 16 queries is answered in a single pass over the DB; the pass itself
+    is split across rayon workers by DB column. Responses come back in query
+    order.
+    """
+    return ypir_rs.answer_batch(ctx.server, list(queries))
+
+
+def ypir_configure(threads: Optional[int] = None) -> None:
+    """
+    Sizes the server thread pool. Call once, before the first answer.
+    SIMD is a build-time choice: .cargo/config.toml builds with
+    `-C target-cpu=native`, which turns on AVX2 (and AVX-512) where the CPU
+    has it. To force AVX2 on a portable build:
+        RUSTFLAGS="-C target-feature=+avx2" maturin build --release
+    """
+    if threads is None:
+        threads = os.cpu_count() or 1
+    os.environ["RAYON_NUM_THREADS"] = str(threads)
+    ypir_rs.set_thread_pool(threads)
+
+
+def ypir_extract(ctx: YpirContext, response_bytes: Union[bytes, memoryview]) -> bytes:
     """
     Returns decoded response words as bytes (little-endian u64s).
     For “record bytes”, you’ll typically slice to item_size_bytes (demo-friendly).
     """
     out = ypir_rs.extract(ctx.client, response_bytes)
     return out
+
+
+def ypir_extract_batch(ctx: YpirContext, responses: Sequence[bytes]) -> List[bytes]:
+    return [ypir_extract(ctx, r) for r in responses]
+
+
+@dataclass
+class YpirProfile:
+    runs: int
+    answer_ms: float                  # mean wall time per answer
+    gb_per_s: float                   # bytes streamed per answer / answer time
+    dram_peak_gbps: float             # reference peak the verdict compares against
+    llc_bytes: Optional[int]          # None where sysfs is unavailable
+    peak_rss_bytes: Optional[int]     # process high-water mark (VmHWM); None without /proc
+    compute_bound: Optional[bool]     # None when the DB fits in cache (or LLC unknown)
+
+
+def _proc_status_bytes(field_name: str) -> Optional[int]:
+    """A kB field of /proc/self/status, in bytes (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field_name + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _llc_bytes() -> Optional[int]:
+    """Size of the highest-level CPU cache from sysfs (Linux only)."""
+    base = "/sys/devices/system/cpu/cpu0/cache"
+    best = None
+    try:
+        for entry in os.listdir(base):
+            if not entry.startswith("index"):
+                continue
+            with open(os.path.join(base, entry, "level")) as f:
+                level = int(f.read())
+            with open(os.path.join(base, entry, "size")) as f:
+                size = f.read().strip()
+            mult = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(size[-1:], 1)
+            nbytes = int(size.rstrip("KMG")) * mult
+            if best is None or level > best[0]:
+                best = (level, nbytes)
+    except (OSError, ValueError):
+        return None
+    return best[1] if best else None
+
+
+def _measure_copy_gbps(nbytes: int, reps: int = 3) -> float:
+    """Best-of-`reps` memcpy bandwidth (read + write bytes) over a buffer of nbytes."""
+    src = np.ones(nbytes, dtype=np.uint8)
+    dst = np.empty_like(src)
+    best_ns = None
+    for _ in range(reps):
+        t0 = time.perf_counter_ns()
+        np.copyto(dst, src)
+        dt = time.perf_counter_ns() - t0
+        best_ns = dt if best_ns is None else min(best_ns, dt)
+    return 2 * nbytes / best_ns
+
+
+def ypir_profile(
+    ctx: YpirContext,
+    runs: int = 50,
+    *,
+    dram_peak_gbps: Optional[float] = None,
+    threshold: float = 0.5,
+) -> YpirProfile:
+    """
+    Runs `answer` `runs` times and classifies it as compute- or memory-bound.
+    Each answer streams the whole DB once, so an achieved bandwidth below
+    `threshold * dram_peak_gbps` means arithmetic, not DRAM, is the limit.
+    `dram_peak_gbps` defaults to a memcpy measured over 4x the LLC. If the DB
+    fits in the LLC the answer runs from cache and no verdict is given.
+    """
+    query = bytes(ypir_make_query(ctx, 0))
+    ns = time.perf_counter_ns
+    total_ns = 0
+    resp_len = 0
+    for _ in range(runs):
+        t0 = ns()
+        resp_len = len(ypir_answer(ctx, query))
+        total_ns += ns() - t0
+
+    streamed = runs * (ctx.required_db_bytes + len(query) + resp_len)
+    gb_per_s = streamed / total_ns if total_ns else 0.0  # bytes/ns == GB/s
+
+    # Sample the high-water mark before the bandwidth probe allocates its buffers.
+    peak_rss = _proc_status_bytes("VmHWM")
+    llc = _llc_bytes()
+    if dram_peak_gbps is None:
+        dram_peak_gbps = _measure_copy_gbps(4 * (llc or 64 << 20))
+    compute_bound = None
+    if llc is not None and ctx.required_db_bytes > llc:
+        compute_bound = gb_per_s < threshold * dram_peak_gbps
+
+    return YpirProfile(
+        runs=runs,
+        answer_ms=total_ns / runs / 1e6 if runs else 0.0,
+        gb_per_s=gb_per_s,
+        dram_peak_gbps=dram_peak_gbps,
+        llc_bytes=llc,
+        peak_rss_bytes=peak_rss,
+        compute_bound=compute_bound,
+    )
@@ -23,15 +23,19 @@ pub fn rlwe_to_lwe_last_row<'a>(_params: &'a Params, ct: &PolyMatrixRaw<'a>) ->
     ct.get_poly(1, 0).to_vec()
 }
 
+/// CRT-pack one query word: the residue mod moduli[0] in the low 32 bits and
+/// the residue mod moduli[1] in the high 32 bits.
+#[inline]
+pub fn pack_query_word(params: &Params, x: u64) -> u64 {
+    let crt0 = x % params.moduli[0];
+    let crt1 = x % params.moduli[1];
+    crt0 | (crt1 << 32)
+}
+
 pub fn pack_query(params: &Params, query: &[u64]) -> AlignedMemory64 {
     let query_packed = query
         .iter()
-        .enumerate()
-        .map(|(_i, x)| {
-            let crt0 = (*x) % params.moduli[0];
-            let crt1 = (*x) % params.moduli[1];
-            crt0 | (crt1 << 32)
-        })
+        .map(|&x| pack_query_word(params, x))
         .collect::<Vec<_>>();
     let mut aligned_query_packed = AlignedMemory64::new(query_packed.len());
     aligned_query_packed
@@ -27,45 +27,43 @@ pub fn fast_batched_dot_product_avx512<const K: usize, T: Copy>(
     assert_eq!(a.len(), K * a_elems);
     assert_eq!(b_t.len(), b_cols * b_rows);
 
-    // Split output into K batches (same as old code).
-    let c_batches = c.chunks_exact_mut(b_cols);
-
-    // Split input `a` into K batches.
-    let a_batches = a.chunks_exact(a_elems);
-
-    // For each output column j, compute dot-products for all K batches.
+    // One pass over the DB for all K queries: the column loop is outermost and
+    // each column keeps K accumulator pairs, so every DB element is read once
+    // and multiplied into all K queries.
     // We keep the same “wrap then Barrett reduce” behavior as the AVX-512 version:
     // - accumulate in u64 with wrapping arithmetic
     // - reduce low/high limbs with barrett_coeff_u64
     // - crt_compose_2 and barrett_u64 for final accumulation into c
-    for (batch_idx, (c_batch, a_batch)) in c_batches.zip(a_batches).enumerate() {
-        debug_assert!(batch_idx < K);
+    for j in 0..b_cols {
+        let mut sum_lo = [0u64; K];
+        let mut sum_hi = [0u64; K];
 
-        for j in 0..b_cols {
-            let mut sum_lo: u64 = 0;
-            let mut sum_hi: u64 = 0;
+        let base = j * b_rows;
 
-            let base = j * b_rows;
+        for k in 0..a_elems {
+            // Read db value (u8/u16/u32) through ToM512 fallback (scalar on non-avx512f).
+            let b_val_u64: u64 = unsafe { b_t.as_ptr().add(base + k).to_m512() };
 
-            for k in 0..a_elems {
-                // Read db value (u8/u16/u32) through ToM512 fallback (scalar on non-avx512f).
-                let b_val_u64: u64 = unsafe { b_t.as_ptr().add(base + k).to_m512() };
-
-                let a_val: u64 = a_batch[k];
+            for q in 0..K {
+                let a_val: u64 = a[q * a_elems + k];
                 let a_lo: u64 = a_val & 0xFFFF_FFFF;
                 let a_hi: u64 = a_val >> 32;
 
                 // Match old behavior: multiply 32-bit limbs by db word, accumulate with wrapping.
-                sum_lo = sum_lo.wrapping_add(a_lo.wrapping_mul(b_val_u64));
-                sum_hi = sum_hi.wrapping_add(a_hi.wrapping_mul(b_val_u64));
+                sum_lo[q] = sum_lo[q].wrapping_add(a_lo.wrapping_mul(b_val_u64));
+                sum_hi[q] = sum_hi[q].wrapping_add(a_hi.wrapping_mul(b_val_u64));
             }
+        }
 
-            // Reduce both limbs, compose CRT, and accumulate into output (same as old kernel).
-            let lo = barrett_coeff_u64(params, sum_lo, 0);
-            let hi = barrett_coeff_u64(params, sum_hi, 1);
+        // Reduce both limbs, compose CRT, and accumulate into output (same as old kernel).
+        // Output keeps the K-batches-concatenated layout: query q, column j at c[q*b_cols + j].
+        for q in 0..K {
+            let lo = barrett_coeff_u64(params, sum_lo[q], 0);
+            let hi = barrett_coeff_u64(params, sum_hi[q], 1);
             let res = params.crt_compose_2(lo, hi);
 
-            c_batch[j] = barrett_u64(params, c_batch[j].wrapping_add(res));
+            let out = &mut c[q * b_cols + j];
+            *out = barrett_u64(params, out.wrapping_add(res));
         }
     }
 }
@@ -102,4 +100,37 @@ mod test {
 
         fast_batched_dot_product_avx512::<K, _>(&params, &mut c, &a, a_elems, b_u16, b_rows, b_cols);
     }
+
+    // K queries share each DB read; each query's output must match answering it alone.
+    #[test]
+    fn test_fast_batched_dot_product_matches_single_queries() {
+        let params = Params::default();
+
+        const K: usize = 3;
+        let a_elems = 256;
+        let b_rows = a_elems;
+        let b_cols = 32;
+
+        let a: Vec<u64> = (0..K * a_elems)
+            .map(|i| ((i as u64).wrapping_mul(0x9E37_79B9) % 65537) | ((i as u64 % 251) << 32))
+            .collect();
+        let b: Vec<u16> = (0..b_rows * b_cols).map(|i| (i * 31 % 65521) as u16).collect();
+
+        let mut c = vec![0u64; K * b_cols];
+        fast_batched_dot_product_avx512::<K, _>(&params, &mut c, &a, a_elems, &b, b_rows, b_cols);
+
+        for q in 0..K {
+            let mut c_single = vec![0u64; b_cols];
+            fast_batched_dot_product_avx512::<1, _>(
+                &params,
+                &mut c_single,
+                &a[q * a_elems..(q + 1) * a_elems],
+                a_elems,
+                &b,
+                b_rows,
+                b_cols,
+            );
+            assert_eq!(&c[q * b_cols..(q + 1) * b_cols], &c_single[..], "query {}", q);
+        }
+    }
 }
@@ -309,6 +309,31 @@ where
         result
     }
 
+    /// Columns `cols` of `multiply_batched_with_db_packed::<K>`, accumulated into
+    /// `out` (zeroed, `K * cols.len()` words; query q at `out[q * cols.len()..]`).
+    /// Disjoint column ranges read disjoint parts of the DB, so callers can split
+    /// one K-query pass across threads.
+    pub fn multiply_batched_with_db_packed_cols<const K: usize>(
+        &self,
+        aligned_query_packed: &[u64],
+        cols: Range<usize>,
+        out: &mut [u64],
+    ) {
+        let db_rows_padded = self.db_rows_padded();
+        assert_eq!(aligned_query_packed.len(), K * db_rows_padded);
+        assert!(cols.end <= self.db_cols());
+
+        fast_batched_dot_product_avx512::<K, _>(
+            self.params,
+            out,
+            aligned_query_packed,
+            db_rows_padded,
+            &self.db()[cols.start * db_rows_padded..cols.end * db_rows_padded],
+            db_rows_padded,
+            cols.len(),
+        );
+    }
+
     pub fn lwe_multiply_batched_with_db_packed<const K: usize>(
         &self,
         aligned_query_packed: &[u32],